@@ -65,6 +65,16 @@ class ConfigDialog(QDialog):
         
         layout.addLayout(automation_group)
         
+        # Local query API section
+        if self.checker.is_query_api_enabled():
+            stop_api_btn = QPushButton("Desactivar API Local")
+            stop_api_btn.clicked.connect(self.stop_query_api)
+            layout.addWidget(stop_api_btn)
+        else:
+            api_btn = QPushButton("Activar API Local")
+            api_btn.clicked.connect(self.start_query_api)
+            layout.addWidget(api_btn)
+        
         # Uninstall button
         uninstall_btn = QPushButton("Desinstalar")
         uninstall_btn.clicked.connect(self.uninstall)
@@ -102,6 +112,22 @@ class ConfigDialog(QDialog):
         QMessageBox.information(self, "Éxito", "Automatización desactivada")
         self.accept()
     
+    def start_query_api(self):
+        """Enable the local query API"""
+        if self.checker.enable_query_api():
+            QMessageBox.information(self, "Éxito",
+                                  "API local activada en "
+                                  f"http://127.0.0.1:{self.checker.get_query_api_port()}")
+            self.accept()
+        else:
+            QMessageBox.critical(self, "Error", "No se pudo iniciar la API local")
+    
+    def stop_query_api(self):
+        """Disable the local query API"""
+        self.checker.disable_query_api()
+        QMessageBox.information(self, "Éxito", "API local desactivada")
+        self.accept()
+    
     def uninstall(self):
         """Handle uninstall request"""
         reply = QMessageBox.question(
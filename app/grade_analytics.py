@@ -0,0 +1,251 @@
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+
+class GradeFrame:
+    """Grade histories flattened into NumPy arrays, one block of rows per course state
+
+    A block holds the items of one course from the snapshot where they
+    changed until the next change, so polls that changed nothing add no
+    rows. Each block keeps how many snapshots it covers and the sums of
+    their times, which is all the trend fit needs. Courses are keyed per
+    account, so the same course followed by two students is two groups.
+    Ungraded items have a NaN raw grade.
+    """
+
+    def __init__(self, accounts, courses, origin, block_course, block_time, block_count,
+                 block_day_sum, block_day_square_sum, block, raw, grade_max, grade_min):
+        self.accounts = accounts                        # account names
+        self.courses = courses                          # (account index, course name) per course group
+        self.origin = origin                            # epoch seconds that days are counted from
+        self.block_course = block_course                # course group per block
+        self.block_time = block_time                    # epoch seconds of the first snapshot of each block
+        self.block_count = block_count                  # snapshots covered by each block
+        self.block_day_sum = block_day_sum              # sum of their days since origin
+        self.block_day_square_sum = block_day_square_sum
+        self.block = block                              # block index per row
+        self.raw = raw
+        self.grade_max = grade_max
+        self.grade_min = grade_min
+
+    @property
+    def graded(self):
+        """Mask of rows that carry a grade"""
+        return ~np.isnan(self.raw)
+
+    @property
+    def grade_range(self):
+        """Points each item is worth, grademax - grademin"""
+        return self.grade_max - self.grade_min
+
+
+def load_histories(histories):
+    """Build a GradeFrame from {account: iterable of (datetime, grades)}
+
+    The snapshot store hands back the same object for a course, or for a
+    whole snapshot, that did not change since the previous one. Those polls
+    only add to the counters of the open blocks; rows are read only for
+    courses that changed.
+    """
+    accounts = []
+    courses = []
+    course_index = {}
+    origin = None
+    block_course, block_time, block_length = [], [], []
+    block_count, block_day_sum, block_day_square_sum = [], [], []
+    raw, grade_max, grade_min = [], [], []
+
+    for account_position, (account, history) in enumerate(histories.items()):
+        accounts.append(account)
+        open_blocks = {}    # course name -> (course data, block index)
+        previous_grades = None
+
+        # Snapshots identical to the previous one, not yet added to the open blocks
+        run_count, run_day_sum, run_day_square_sum = 0, 0.0, 0.0
+
+        for timestamp, grades in history:
+            seconds = timestamp.timestamp()
+            if origin is None:
+                origin = seconds
+            day = (seconds - origin) / SECONDS_PER_DAY
+            if grades is previous_grades:
+                run_count += 1
+                run_day_sum += day
+                run_day_square_sum += day * day
+                continue
+
+            for _, block in open_blocks.values():
+                block_count[block] += run_count
+                block_day_sum[block] += run_day_sum
+                block_day_square_sum[block] += run_day_square_sum
+            run_count, run_day_sum, run_day_square_sum = 1, day, day * day
+
+            current_blocks = {}
+            for course_name, course_data in grades.items():
+                opened = open_blocks.get(course_name)
+                if opened is not None and opened[0] is course_data:
+                    current_blocks[course_name] = opened
+                    continue
+
+                items = course_data.get('grades', [])
+                if not items:
+                    continue
+                key = (account_position, course_name)
+                if key not in course_index:
+                    course_index[key] = len(courses)
+                    courses.append(key)
+
+                current_blocks[course_name] = (course_data, len(block_course))
+                block_course.append(course_index[key])
+                block_time.append(seconds)
+                block_length.append(len(items))
+                block_count.append(0)
+                block_day_sum.append(0.0)
+                block_day_square_sum.append(0.0)
+                raw.extend([item.get('graderaw') for item in items])
+                grade_max.extend([item.get('grademax') or 0 for item in items])
+                grade_min.extend([item.get('grademin') or 0 for item in items])
+
+            open_blocks = current_blocks
+            previous_grades = grades
+
+        for _, block in open_blocks.values():
+            block_count[block] += run_count
+            block_day_sum[block] += run_day_sum
+            block_day_square_sum[block] += run_day_square_sum
+
+    # None becomes NaN in a float array, marking ungraded items
+    return GradeFrame(
+        accounts, courses, origin or 0.0,
+        np.asarray(block_course, dtype=np.int64),
+        np.asarray(block_time, dtype=np.float64),
+        np.asarray(block_count, dtype=np.float64),
+        np.asarray(block_day_sum, dtype=np.float64),
+        np.asarray(block_day_square_sum, dtype=np.float64),
+        np.repeat(np.arange(len(block_course), dtype=np.int64), np.asarray(block_length, dtype=np.int64)),
+        np.array(raw, dtype=np.float64),
+        np.asarray(grade_max, dtype=np.float64),
+        np.asarray(grade_min, dtype=np.float64),
+    )
+
+
+def normalized_scores(frame):
+    """Score of every row in [0, 1] against its own grademin/grademax, NaN if ungraded"""
+    grade_range = frame.grade_range
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = (frame.raw - frame.grade_min) / grade_range
+    scores[grade_range <= 0] = np.nan
+    return scores
+
+
+def course_totals(frame):
+    """Weighted totals per block, that is per course state
+
+    Items count in proportion to the points they are worth, so the
+    percentage is earned points over the points of the graded items.
+    """
+    block_total = len(frame.block_course)
+    graded = frame.graded
+    grade_range = np.clip(frame.grade_range, 0, None)
+    earned = np.where(graded, frame.raw - frame.grade_min, 0.0)
+
+    achieved = np.bincount(frame.block, weights=earned, minlength=block_total)
+    graded_possible = np.bincount(frame.block, weights=np.where(graded, grade_range, 0.0), minlength=block_total)
+    total_possible = np.bincount(frame.block, weights=grade_range, minlength=block_total)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentage = np.where(graded_possible > 0, achieved / graded_possible * 100, np.nan)
+        completion = np.where(total_possible > 0, graded_possible / total_possible, 0.0)
+
+    return {
+        'course': frame.block_course,
+        'time': frame.block_time,
+        'achieved': achieved,
+        'graded_possible': graded_possible,
+        'total_possible': total_possible,
+        'percentage': percentage,
+        'completion': completion,
+    }
+
+
+def course_trends(frame, totals):
+    """Least-squares slope of each course percentage over every snapshot, in points per day
+
+    A block stands for all the snapshots it covers through their count and
+    time sums, so the fit matches one point per snapshot.
+    """
+    valid = ~np.isnan(totals['percentage'])
+    course = frame.block_course[valid]
+    y = totals['percentage'][valid]
+    n = frame.block_count[valid]
+    x_sum = frame.block_day_sum[valid]
+    count = len(frame.courses)
+
+    total_n = np.bincount(course, weights=n, minlength=count)
+    total_x = np.bincount(course, weights=x_sum, minlength=count)
+    total_y = np.bincount(course, weights=n * y, minlength=count)
+    total_xy = np.bincount(course, weights=x_sum * y, minlength=count)
+    total_xx = np.bincount(course, weights=frame.block_day_square_sum[valid], minlength=count)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = total_xy - total_x * total_y / total_n
+        variance = total_xx - total_x * total_x / total_n
+        # Rounding can leave a tiny variance when every snapshot has the same time
+        return np.where(variance > 1e-9 * np.maximum(total_xx, 1.0), covariance / variance, np.nan)
+
+
+def latest_totals(frame, totals):
+    """Index into totals of the most recent block of every course, -1 if none"""
+    latest = np.full(len(frame.courses), -1, dtype=np.int64)
+    if len(totals['course']) == 0:
+        return latest
+
+    # Blocks of a course are created in time order, so the last one is the highest index
+    np.maximum.at(latest, totals['course'], np.arange(len(totals['course'])))
+    return latest
+
+
+def projected_finals(frame, totals, scale=20):
+    """Projected final grade per course if the remaining items keep the current rate"""
+    latest = latest_totals(frame, totals)
+    valid = latest >= 0
+    projected = np.full(len(frame.courses), np.nan)
+
+    achieved = totals['achieved'][latest[valid]]
+    graded_possible = totals['graded_possible'][latest[valid]]
+    total_possible = totals['total_possible'][latest[valid]]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(graded_possible > 0, achieved / graded_possible, np.nan)
+        final = (achieved + (total_possible - graded_possible) * rate) / total_possible
+    projected[valid] = final * scale
+    return projected
+
+
+def summarize(frame, scale=20):
+    """Latest percentage, trend and projected final of every course
+
+    Returns {account: {course name: summary}} for display or export.
+    """
+    summary = {account: {} for account in frame.accounts}
+    if len(frame.raw) == 0:
+        return summary
+
+    totals = course_totals(frame)
+    trends = course_trends(frame, totals)
+    projected = projected_finals(frame, totals, scale)
+    latest = latest_totals(frame, totals)
+
+    for position, (account_position, course_name) in enumerate(frame.courses):
+        row = latest[position]
+        if row < 0:
+            continue
+        percentage = totals['percentage'][row]
+        summary[frame.accounts[account_position]][course_name] = {
+            'percentage': None if np.isnan(percentage) else float(percentage),
+            'completion': float(totals['completion'][row]),
+            'trend_per_day': None if np.isnan(trends[position]) else float(trends[position]),
+            'projected_final': None if np.isnan(projected[position]) else float(projected[position]),
+        }
+    return summary
@@ -2,36 +2,82 @@ import requests
 import json
 import os
 import hashlib
+import threading
 from datetime import datetime
-import platform
 import sys
 import keyring
 from PySide6.QtCore import QSettings
-from PySide6.QtWidgets import QMessageBox
-import winsound
+from .grade_history import GradeHistoryStore
+from .query_server import GradeState, QueryServer
+from .notifiers import (NotificationDispatcher, Notification, SmtpSink,
+                        WebhookSink, FileDropSink)
 
 class MoodleGradeChecker:
-    def __init__(self):
-        self.base_url = "https://www.uneti.edu.ve/campus/"  # Fixed URL from CLI version
+    def __init__(self, data_dir=None, settings=None, base_url=None):
+        self.base_url = base_url or "https://www.uneti.edu.ve/campus/"  # Fixed URL from CLI version
         self.api_url = f"{self.base_url}/webservice/rest/server.php"
         self.max_grade = 20
         
+        # Settings
+        self.settings = settings or QSettings("VerificadorNotas", "Settings")
+        
         # File paths
-        self.data_dir = os.path.expanduser("~/.verificador-notas")
+        self.data_dir = data_dir or os.path.expanduser("~/.verificador-notas")
         os.makedirs(self.data_dir, exist_ok=True)
         
         self.grades_file = os.path.join(self.data_dir, "previous_grades.json")
         self.current_grades_file = os.path.join(self.data_dir, "notas_actuales.txt")
         self.history_file = os.path.join(self.data_dir, "grade_history.txt")
+        self.snapshots_file = os.path.join(self.data_dir, "grade_snapshots.bin")
         
-        # Settings
-        self.settings = QSettings("VerificadorNotas", "Settings")
+        # Every snapshot, delta-encoded against the previous one
+        self.snapshot_store = GradeHistoryStore(
+            self.snapshots_file,
+            max_bytes=self.settings.value("history/max_snapshot_bytes", 5 * 1024 * 1024, type=int)
+        )
+        
+        # grade_history.txt is rotated so it never grows without bound
+        self.history_max_bytes = self.settings.value("history/max_bytes", 1024 * 1024, type=int)
+        self.history_backups = self.settings.value("history/backups", 3, type=int)
+        
+        # Several web-service calls are packed into one request when the site allows it
+        self.batch_function = 'tool_mobile_call_external_functions'
+        self.batch_unavailable_errors = {'invalidrecord', 'accessexception', 'servicenotavailable'}
+        self.batch_size = 25
+        self.batch_supported = None
+        self.user_id = None
+        
+        # In-memory grades served to local tools, primed from disk by prime_state()
+        self.state = GradeState()
+        self.query_server = None
+        
+        # Notifications are delivered in the background by pluggable sinks
+        self.notifier = NotificationDispatcher()
+        self.configure_notifiers()
         
-        # Get stored token if available
-        self.token = self.get_token_from_keyring()
+        # The stored token is loaded lazily so startup never waits on the keyring
+        self.token = None
+        self.token_loaded = False
+        self._token_lock = threading.Lock()
+
+    def load_token(self):
+        """Load the stored token from the keyring once, safe to call from any thread"""
+        with self._token_lock:
+            if not self.token_loaded:
+                self.token = self.get_token_from_keyring()
+                self.token_loaded = True
+        return self.token
+
+    def prime_state(self):
+        """Load the last saved grades and the snapshot index, meant for a background thread"""
+        self.state.load_cached(self.load_previous_grades())
+        self.snapshot_store.load_index()
 
     def is_configured(self):
         """Check if the app is configured"""
+        if not self.token_loaded:
+            # Until the keyring answers, a saved username means we were logged in
+            return bool(self.settings.value("credentials/username"))
         return bool(self.token)
     
     def has_stored_credentials(self):
@@ -65,7 +111,11 @@ class MoodleGradeChecker:
                 # Store token in keyring
                 keyring.set_password("verificador-notas", username, token)
                 self.settings.setValue("credentials/username", username)
+                self.settings.remove("credentials/userid")
+                self.user_id = None
+                self.batch_supported = None
                 self.token = token
+                self.token_loaded = True
                 return True
             return False
         except Exception as e:
@@ -104,7 +154,11 @@ class MoodleGradeChecker:
             if username:
                 keyring.delete_password("verificador-notas", username)
             self.settings.remove("credentials/username")
+            self.settings.remove("credentials/userid")
+            self.user_id = None
+            self.batch_supported = None
             self.token = None
+            self.token_loaded = True
         except:
             pass
 
@@ -117,6 +171,46 @@ class MoodleGradeChecker:
         """Disable automated grade checking"""
         self.settings.setValue("automation/enabled", False)
 
+    def is_query_api_enabled(self):
+        """Check if the local query API is enabled"""
+        return self.settings.value("api/enabled", False, type=bool)
+    
+    def get_query_api_port(self):
+        """Get the port of the local query API"""
+        return self.settings.value("api/port", 8765, type=int)
+
+    def enable_query_api(self, port=None):
+        """Enable the local query API and start serving it"""
+        self.settings.setValue("api/enabled", True)
+        if port:
+            self.settings.setValue("api/port", port)
+        return self.start_query_server()
+
+    def disable_query_api(self):
+        """Disable the local query API and stop serving it"""
+        self.settings.setValue("api/enabled", False)
+        self.stop_query_server()
+
+    def start_query_server(self):
+        """Serve the in-memory grades on localhost"""
+        if self.query_server:
+            return True
+        try:
+            self.query_server = QueryServer(self.state, port=self.get_query_api_port(),
+                                            analytics=self.get_course_analytics)
+            self.query_server.start()
+            return True
+        except Exception as e:
+            print(f"Error starting query server: {e}")
+            self.query_server = None
+            return False
+
+    def stop_query_server(self):
+        """Stop the local query server if it is running"""
+        if self.query_server:
+            self.query_server.stop()
+            self.query_server = None
+
     def validate_token(self):
         """Validate that the token works"""
         if not self.token:
@@ -128,8 +222,8 @@ class MoodleGradeChecker:
             print(f"Error validating token: {e}")
             return False
 
-    def make_api_call(self, function, params=None):
-        """Make a call to Moodle API"""
+    def post_api_request(self, function, params=None):
+        """POST one web-service request and return the decoded response, or None"""
         if not self.token:
             return None
 
@@ -144,59 +238,177 @@ class MoodleGradeChecker:
         try:
             response = requests.post(self.api_url, data=data, timeout=30)
             response.raise_for_status()
-            result = response.json()
-            
-            if isinstance(result, dict) and 'exception' in result:
-                return None
-                
-            return result
+            return response.json()
         except Exception as e:
             print(f"API call error: {e}")
             return None
 
+    def make_api_call(self, function, params=None):
+        """Make a call to Moodle API"""
+        result = self.post_api_request(function, params)
+        
+        if isinstance(result, dict) and 'exception' in result:
+            return None
+            
+        return result
+
+    def make_batched_api_calls(self, calls):
+        """Make several Moodle API calls, packed into as few requests as possible
+        
+        Each call is a (function, params) pair and the results come back in the
+        same order, with None for calls that failed. Falls back to individual
+        calls when the site does not offer the batch function.
+        """
+        results = []
+        for start in range(0, len(calls), self.batch_size):
+            chunk = calls[start:start + self.batch_size]
+            chunk_results = None
+            if self.batch_supported is not False and len(chunk) > 1:
+                chunk_results = self.call_external_functions(chunk)
+            if chunk_results is None:
+                chunk_results = [self.make_api_call(function, params) for function, params in chunk]
+            results.extend(chunk_results)
+        return results
+
+    def call_external_functions(self, calls):
+        """Run several functions in one request, or return None if the batch failed"""
+        params = {}
+        for index, (function, arguments) in enumerate(calls):
+            params[f'requests[{index}][function]'] = function
+            params[f'requests[{index}][arguments]'] = json.dumps(arguments or {})
+        
+        result = self.post_api_request(self.batch_function, params)
+        if not isinstance(result, dict):
+            return None
+        
+        if 'exception' in result or 'responses' not in result:
+            print(f"Batch call failed: {result.get('message', result.get('errorcode'))}")
+            if result.get('errorcode') in self.batch_unavailable_errors:
+                # The function is missing or not allowed for this service, stop trying it
+                self.batch_supported = False
+            return None
+        
+        self.batch_supported = True
+        results = []
+        for response in result['responses']:
+            if response.get('error') or response.get('data') is None:
+                results.append(None)
+                continue
+            try:
+                data = json.loads(response['data'])
+            except (TypeError, ValueError):
+                data = None
+            if isinstance(data, dict) and 'exception' in data:
+                data = None
+            results.append(data)
+        
+        if len(results) != len(calls):
+            return None
+        return results
+
     def get_user_info(self):
         """Get current user information"""
-        return self.make_api_call('core_webservice_get_site_info')
+        user_info = self.make_api_call('core_webservice_get_site_info')
+        self.remember_user_id(user_info)
+        return user_info
 
-    def get_enrolled_courses(self):
-        """Get courses the user is enrolled in"""
+    def remember_user_id(self, user_info):
+        """Cache the user id so later calls can skip the site info request"""
+        # Only write when it changes, every check would otherwise rewrite the setting
+        if user_info and 'userid' in user_info and user_info['userid'] != self.get_cached_user_id():
+            self.user_id = user_info['userid']
+            self.settings.setValue("credentials/userid", self.user_id)
+
+    def get_cached_user_id(self):
+        """Get the user id remembered from a previous check, or None"""
+        if self.user_id is None:
+            self.user_id = self.settings.value("credentials/userid", None, type=int) or None
+        return self.user_id
+
+    def get_user_id(self):
+        """Get the cached user id, asking the site only if it is unknown"""
+        user_id = self.get_cached_user_id()
+        if user_id:
+            return user_id
         user_info = self.get_user_info()
         if not user_info or 'userid' not in user_info:
             return None
+        return user_info['userid']
+
+    def get_user_info_and_courses(self):
+        """Get site info and enrolled courses, in one request when the user id is cached"""
+        user_id = self.get_cached_user_id()
+        if not user_id:
+            user_info = self.get_user_info()
+            return user_info, self.get_enrolled_courses() if user_info else None
+        
+        user_info, courses = self.make_batched_api_calls([
+            ('core_webservice_get_site_info', None),
+            ('core_enrol_get_users_courses', {'userid': user_id})
+        ])
+        self.remember_user_id(user_info)
+        
+        if user_info and user_info.get('userid') != user_id:
+            # The token belongs to another user now, the courses we fetched are not theirs
+            courses = self.get_enrolled_courses()
+        return user_info, courses
+
+    def get_enrolled_courses(self):
+        """Get courses the user is enrolled in"""
+        user_id = self.get_user_id()
+        if not user_id:
+            return None
         
         return self.make_api_call('core_enrol_get_users_courses', 
-                                {'userid': user_info['userid']})
+                                {'userid': user_id})
 
     def get_grades_for_course(self, course_id):
         """Get grades for a specific course"""
-        user_info = self.get_user_info()
-        if not user_info or 'userid' not in user_info:
+        user_id = self.get_user_id()
+        if not user_id:
             return None
         
         return self.make_api_call('gradereport_user_get_grade_items',
-                                {'courseid': course_id, 'userid': user_info['userid']})
+                                {'courseid': course_id, 'userid': user_id})
+
+    def configure_notifiers(self):
+        """Add the optional email, webhook and file drop sinks from the settings"""
+        smtp_host = self.settings.value("notifications/smtp_host")
+        smtp_to = self.settings.value("notifications/smtp_to")
+        if smtp_host and smtp_to:
+            self.notifier.add_sink(SmtpSink(
+                smtp_host,
+                self.settings.value("notifications/smtp_port", 25, type=int),
+                self.settings.value("notifications/smtp_from", "verificador-notas@localhost"),
+                [address.strip() for address in smtp_to.split(",") if address.strip()],
+                username=self.settings.value("notifications/smtp_username"),
+                use_tls=self.settings.value("notifications/smtp_tls", False, type=bool)
+            ))
+        
+        webhook_url = self.settings.value("notifications/webhook_url")
+        if webhook_url:
+            self.notifier.add_sink(WebhookSink(webhook_url))
+        
+        drop_dir = self.settings.value("notifications/drop_dir")
+        if drop_dir:
+            self.notifier.add_sink(FileDropSink(drop_dir))
 
     def send_notification(self, title, message, grade_details=None):
-        """Send a desktop notification"""
+        """Queue a notification for every sink without blocking the check"""
         try:
-            if platform.system() == "Windows":
-                # Play Windows notification sound
-                winsound.MessageBeep(winsound.MB_OK)
+            if grade_details:
+                course_name = grade_details.get('course', 'Curso Desconocido')
+                assignment_name = grade_details.get('assignment', 'Tarea Desconocida')
+                new_grade = grade_details.get('new_grade', 'Desconocido')
+                old_grade = grade_details.get('old_grade', None)
                 
-                if grade_details:
-                    course_name = grade_details.get('course', 'Curso Desconocido')
-                    assignment_name = grade_details.get('assignment', 'Tarea Desconocida')
-                    new_grade = grade_details.get('new_grade', 'Desconocido')
-                    old_grade = grade_details.get('old_grade', None)
-                    
-                    if old_grade:
-                        dialog_message = f"Tu calificación en '{course_name}' para la tarea '{assignment_name}' ha sido actualizada.\n\nCalificación anterior: {old_grade}\nNueva calificación: {new_grade}"
-                    else:
-                        dialog_message = f"Has recibido una nueva calificación en '{course_name}' para la tarea '{assignment_name}'.\n\nTu calificación: {new_grade}"
-                    
-                    QMessageBox.information(None, "🎓 Actualización de Calificación", dialog_message)
+                if old_grade:
+                    message = f"Tu calificación en '{course_name}' para la tarea '{assignment_name}' ha sido actualizada.\n\nCalificación anterior: {old_grade}\nNueva calificación: {new_grade}"
                 else:
-                    QMessageBox.information(None, title, message)
+                    message = f"Has recibido una nueva calificación en '{course_name}' para la tarea '{assignment_name}'.\n\nTu calificación: {new_grade}"
+                title = "🎓 Actualización de Calificación"
+            
+            self.notifier.dispatch(Notification(title, message, grade_details))
         except Exception as e:
             print(f"Error sending notification: {e}")
 
@@ -229,19 +441,29 @@ class MoodleGradeChecker:
         
         return grade_items
 
-    def get_all_grades(self):
+    def get_all_grades(self, courses=None):
         """Get all grades from all enrolled courses"""
-        courses = self.get_enrolled_courses()
+        if courses is None:
+            courses = self.get_enrolled_courses()
         if not courses:
             return None
+        
+        user_id = self.get_user_id()
+        if not user_id:
+            return None
+
+        # Fetch every course's grade items in one batched round-trip
+        grades_results = self.make_batched_api_calls([
+            ('gradereport_user_get_grade_items', {'courseid': course['id'], 'userid': user_id})
+            for course in courses
+        ])
 
         all_grades = {}
         
-        for course in courses:
+        for course, grades_data in zip(courses, grades_results):
             course_id = course['id']
             course_name = course['fullname']
             
-            grades_data = self.get_grades_for_course(course_id)
             grade_items = self.extract_grade_items(grades_data)
             
             if grade_items:
@@ -291,9 +513,81 @@ class MoodleGradeChecker:
         with open(self.grades_file, 'w') as f:
             json.dump({
                 'timestamp': datetime.now().isoformat(),
-                'grades': grades
+                'grades': grades,
+                'watermarks': self.compute_watermarks(grades)
             }, f, indent=2)
 
+    def get_grade_watermark(self, grade_items):
+        """Get the latest gradedategraded timestamp among the grade items"""
+        return max((item.get('gradedategraded') or 0 for item in grade_items), default=0)
+
+    def get_settled_digest(self, grade_items, watermark):
+        """Hash the items graded at or before the watermark, which should not change"""
+        # Undated items only count once they carry a grade, so grading one changes the digest
+        settled = sorted(
+            (str(item.get('id')), item.get('graderaw'), item.get('gradedategraded'))
+            for item in grade_items
+            if (item.get('graderaw') is not None or item.get('gradedategraded'))
+            and (item.get('gradedategraded') or 0) <= watermark
+        )
+        return hashlib.sha1(json.dumps(settled).encode('utf-8')).hexdigest()
+
+    def compute_watermarks(self, grades):
+        """Compute the per-course high-water mark and digest of its settled items"""
+        watermarks = {}
+        for course_name, course_data in grades.items():
+            items = course_data.get('grades', [])
+            watermark = self.get_grade_watermark(items)
+            watermarks[course_name] = {
+                'watermark': watermark,
+                'digest': self.get_settled_digest(items, watermark)
+            }
+        return watermarks
+
+    def get_items_to_compare(self, current_items, watermark_info):
+        """Select the items that may have changed since the last check
+        
+        If every item graded up to the previous watermark is unchanged, only the
+        items graded after it need diffing; otherwise some grade changed without
+        a date bump and the whole course is compared.
+        """
+        if not watermark_info:
+            return current_items
+        
+        watermark = watermark_info.get('watermark', 0)
+        if self.get_settled_digest(current_items, watermark) != watermark_info.get('digest'):
+            return current_items
+        
+        return [item for item in current_items
+                if (item.get('gradedategraded') or 0) > watermark]
+
+    def record_snapshot(self, grades):
+        """Append the grades to the compressed snapshot history"""
+        try:
+            self.snapshot_store.append(grades)
+        except Exception as e:
+            print(f"Error recording grade snapshot: {e}")
+
+    def get_grades_at(self, when):
+        """Reconstruct the grades as they were at a given datetime"""
+        try:
+            return self.snapshot_store.snapshot_at(when)
+        except Exception as e:
+            print(f"Error reading grade snapshot: {e}")
+            return None
+
+    def get_course_analytics(self):
+        """Summarize percentage, trend and projected final of every course from the history"""
+        # Imported here so NumPy does not slow down startup
+        from .grade_analytics import load_histories, summarize
+        
+        if not self.snapshot_store.index:
+            return {}
+        
+        account = self.settings.value("credentials/username") or ""
+        frame = load_histories({account: self.snapshot_store.iter_snapshots()})
+        return summarize(frame, scale=self.max_grade).get(account, {})
+
     def write_current_grades_to_file(self, current_grades):
         """Write the current grades to notas_actuales.txt"""
         try:
@@ -325,8 +619,31 @@ class MoodleGradeChecker:
                 f.write(f"Calificación máxima del curso: {self.max_grade}\n")
                 f.write("=" * 80 + "\n\n")
 
+    def rotate_history_file(self):
+        """Rotate grade_history.txt into numbered backups once it is too large"""
+        try:
+            if not os.path.exists(self.history_file) or os.path.getsize(self.history_file) < self.history_max_bytes:
+                return
+            
+            base, extension = os.path.splitext(self.history_file)
+            oldest = f"{base}.{self.history_backups}{extension}"
+            if os.path.exists(oldest):
+                os.remove(oldest)
+            for number in range(self.history_backups - 1, 0, -1):
+                backup = f"{base}.{number}{extension}"
+                if os.path.exists(backup):
+                    os.replace(backup, f"{base}.{number + 1}{extension}")
+            
+            if self.history_backups > 0:
+                os.replace(self.history_file, f"{base}.1{extension}")
+            else:
+                os.remove(self.history_file)
+        except Exception as e:
+            print(f"Error rotating history file: {e}")
+
     def log_to_history(self, message, course_name=None, grade_item=None, old_grade=None, new_grade=None):
         """Log a message to the history file"""
+        self.rotate_history_file()
         self.init_history_file()
         
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -369,6 +686,7 @@ class MoodleGradeChecker:
             return changes, notification_messages
 
         prev_grades = previous_grades['grades']
+        prev_watermarks = previous_grades.get('watermarks', {})
         
         # Check each current course
         for course_name, course_data in current_grades.items():
@@ -386,14 +704,22 @@ class MoodleGradeChecker:
             current_percentage = course_data.get('percentage', 0)
             current_achieved = course_data.get('total_achieved', 0)
             
-            for current_item in current_items:
+            candidate_items = self.get_items_to_compare(current_items, prev_watermarks.get(course_name))
+            if not candidate_items:
+                continue
+            
+            previous_by_id = {}
+            previous_by_name = {}
+            for item in previous_items:
+                previous_by_id.setdefault(item.get('id'), item)
+                previous_by_name.setdefault(item.get('itemname'), item)
+            
+            for current_item in candidate_items:
                 item_name = current_item.get('itemname', 'Desconocido')
                 item_id = current_item.get('id')
                 current_grade = current_item.get('graderaw')
                 
-                previous_item = next((item for item in previous_items 
-                                    if item.get('id') == item_id or 
-                                    item.get('itemname') == item_name), None)
+                previous_item = previous_by_id.get(item_id) or previous_by_name.get(item_name)
                 
                 if previous_item:
                     prev_grade = previous_item.get('graderaw')
@@ -440,11 +766,30 @@ class MoodleGradeChecker:
 
     def check_grades(self):
         """Check for grade changes and return list of changes"""
-        if not self.validate_token():
+        self.state.start_check()
+        changes = self.run_check()
+        
+        if changes and changes[0].startswith("❌"):
+            self.state.record_error(changes[0])
+        
+        return changes
+
+    def run_check(self):
+        """Fetch, compare and save the grades, returning the list of changes"""
+        self.load_token()
+        if not self.token:
+            return ["❌ Error: Token inválido o faltante"]
+        
+        try:
+            user_info, courses = self.get_user_info_and_courses()
+        except Exception as e:
+            print(f"Error validating token: {e}")
+            user_info, courses = None, None
+        if not user_info or 'userid' not in user_info:
             return ["❌ Error: Token inválido o faltante"]
         
         try:
-            current_grades = self.get_all_grades()
+            current_grades = self.get_all_grades(courses)
             if not current_grades:
                 return ["❌ Error al recuperar calificaciones"]
             
@@ -454,6 +799,8 @@ class MoodleGradeChecker:
             
             self.save_current_grades(current_grades)
             self.write_current_grades_to_file(current_grades)
+            self.record_snapshot(current_grades)
+            self.state.update(current_grades, changes)
             
             return changes if changes else []
             
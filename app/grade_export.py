@@ -0,0 +1,201 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date, datetime, time, timedelta
+from .grade_history import GradeHistoryStore
+
+DEFAULT_DATA_DIR = os.path.expanduser("~/.verificador-notas")
+
+SNAPSHOT_FIELDS = ['timestamp', 'course', 'course_id', 'item_id', 'itemname', 'graderaw',
+                   'gradeformatted', 'grademax', 'grademin', 'percentageformatted', 'gradedategraded']
+CHANGE_FIELDS = ['timestamp', 'change', 'course', 'course_id', 'item_id', 'itemname',
+                 'old_grade', 'new_grade']
+
+
+def course_matches(course_name, course_data, courses):
+    """Check whether a course passes the course filter (by name or id)"""
+    if not courses:
+        return True
+    return course_name in courses or str(course_data.get('course_id')) in courses
+
+
+def iter_snapshot_rows(grades, timestamp, courses=None):
+    """Yield one row per grade item of a snapshot"""
+    for course_name, course_data in grades.items():
+        if not course_matches(course_name, course_data, courses):
+            continue
+        for item in course_data.get('grades', []):
+            yield {
+                'timestamp': timestamp.isoformat(),
+                'course': course_name,
+                'course_id': course_data.get('course_id'),
+                'item_id': item.get('id'),
+                'itemname': item.get('itemname'),
+                'graderaw': item.get('graderaw'),
+                'gradeformatted': item.get('gradeformatted'),
+                'grademax': item.get('grademax'),
+                'grademin': item.get('grademin'),
+                'percentageformatted': item.get('percentageformatted'),
+                'gradedategraded': item.get('gradedategraded'),
+            }
+
+
+def iter_change_rows(previous, current, timestamp, courses=None):
+    """Yield one row per difference between two consecutive snapshots"""
+    for course_name, course_data in current.items():
+        if not course_matches(course_name, course_data, courses):
+            continue
+
+        course_id = course_data.get('course_id')
+        if course_name not in previous:
+            yield {'timestamp': timestamp.isoformat(), 'change': 'new_course', 'course': course_name,
+                   'course_id': course_id, 'item_id': None, 'itemname': None,
+                   'old_grade': None, 'new_grade': None}
+
+        previous_items = {item.get('id'): item
+                          for item in previous.get(course_name, {}).get('grades', [])}
+        for item in course_data.get('grades', []):
+            previous_item = previous_items.pop(item.get('id'), None)
+            new_grade = item.get('graderaw')
+            if previous_item is None:
+                change = 'new_item'
+                old_grade = None
+            elif previous_item.get('graderaw') != new_grade:
+                change = 'updated'
+                old_grade = previous_item.get('graderaw')
+            else:
+                continue
+            yield {'timestamp': timestamp.isoformat(), 'change': change, 'course': course_name,
+                   'course_id': course_id, 'item_id': item.get('id'), 'itemname': item.get('itemname'),
+                   'old_grade': old_grade, 'new_grade': new_grade}
+
+        for item in previous_items.values():
+            yield {'timestamp': timestamp.isoformat(), 'change': 'removed_item', 'course': course_name,
+                   'course_id': course_id, 'item_id': item.get('id'), 'itemname': item.get('itemname'),
+                   'old_grade': item.get('graderaw'), 'new_grade': None}
+
+    for course_name, course_data in previous.items():
+        if course_name not in current and course_matches(course_name, course_data, courses):
+            yield {'timestamp': timestamp.isoformat(), 'change': 'removed_course', 'course': course_name,
+                   'course_id': course_data.get('course_id'), 'item_id': None, 'itemname': None,
+                   'old_grade': None, 'new_grade': None}
+
+
+def iter_history_changes(store, courses=None, start=None, end=None):
+    """Yield the change rows between start and end, one snapshot in memory at a time"""
+    # Replay from the last snapshot before start, only to compare the first one in range against it
+    seek = store.timestamp_at(start - timedelta(microseconds=1)) if start is not None else None
+    previous = None
+    for timestamp, grades in store.iter_snapshots(start=seek, end=end):
+        if previous is not None and (start is None or timestamp >= start):
+            yield from iter_change_rows(previous, grades, timestamp, courses)
+        previous = grades
+
+
+def load_current_snapshot(store, data_dir, until=None):
+    """Return (timestamp, grades) for the latest snapshot, or the one in effect at a date"""
+    if store.index:
+        if until is None:
+            return datetime.fromtimestamp(store.index[-1][0]), store.latest()
+        return store.timestamp_at(until), store.snapshot_at(until)
+
+    # Installations from before the snapshot history only have the latest grades
+    grades_file = os.path.join(data_dir, "previous_grades.json")
+    if os.path.exists(grades_file):
+        with open(grades_file, 'r') as f:
+            saved = json.load(f)
+        timestamp = datetime.fromisoformat(saved['timestamp'])
+        if until is None or timestamp <= until:
+            return timestamp, saved.get('grades', {})
+    return None, None
+
+
+def to_local_time(value):
+    """Convert a datetime with a UTC offset to naive local time, like the stored timestamps"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def parse_date(value, end_of_day=False):
+    """Parse an ISO date or datetime, a bare date meaning the start or the end of that day"""
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        pass
+    else:
+        return datetime.combine(day, time.max if end_of_day else time.min)
+    try:
+        return to_local_time(datetime.fromisoformat(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida: {value}")
+
+
+def parse_until(value):
+    """Parse --until, where a bare date includes the whole day"""
+    return parse_date(value, end_of_day=True)
+
+
+def write_rows(rows, fields, output, fmt):
+    """Stream rows to output as CSV or JSON Lines"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            output.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def export_grades(output, fmt='csv', what='snapshot', courses=None, start=None, end=None,
+                  data_dir=DEFAULT_DATA_DIR):
+    """Export the current snapshot or the change history and return the row count"""
+    start, end = to_local_time(start), to_local_time(end)
+    store = GradeHistoryStore(os.path.join(data_dir, "grade_snapshots.bin"))
+
+    if what == 'changes':
+        return write_rows(iter_history_changes(store, courses, start, end), CHANGE_FIELDS, output, fmt)
+
+    timestamp, grades = load_current_snapshot(store, data_dir, end)
+    rows = iter_snapshot_rows(grades, timestamp, courses) if grades else iter([])
+    return write_rows(rows, SNAPSHOT_FIELDS, output, fmt)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.grade_export",
+        description="Exporta las calificaciones actuales o el historial de cambios.")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv',
+                        help="formato de salida (por defecto: csv)")
+    parser.add_argument('--what', choices=['snapshot', 'changes'], default='snapshot',
+                        help="calificaciones actuales o historial de cambios (por defecto: snapshot)")
+    parser.add_argument('--course', action='append',
+                        help="nombre o id del curso a exportar (se puede repetir)")
+    parser.add_argument('--since', type=parse_date,
+                        help="fecha inicial, formato ISO (ej. 2026-03-01)")
+    parser.add_argument('--until', type=parse_until,
+                        help="fecha final, formato ISO, incluye el día completo (ej. 2026-07-31)")
+    parser.add_argument('--output', help="archivo de salida (por defecto: salida estándar)")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help="directorio de datos del verificador")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            count = export_grades(f, args.format, args.what, args.course, args.since, args.until, args.data_dir)
+    else:
+        count = export_grades(sys.stdout, args.format, args.what, args.course, args.since, args.until, args.data_dir)
+
+    print(f"{count} filas exportadas", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import os
+import json
+import struct
+import threading
+import zlib
+from datetime import datetime
+
+# Record header: timestamp (epoch seconds), record kind, payload length
+RECORD_HEADER = struct.Struct('<IBI')
+KIND_FULL = 0
+KIND_DELTA = 1
+
+
+def diff_values(old, new):
+    """Build a delta that turns old into new, or None if they are equal"""
+    if old == new:
+        return None
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = {}
+        for key, value in new.items():
+            if key not in old:
+                changed[key] = ['=', value]
+            else:
+                sub_diff = diff_values(old[key], value)
+                if sub_diff is not None:
+                    changed[key] = sub_diff
+        removed = [key for key in old if key not in new]
+        return ['d', changed, removed]
+
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        changed = {}
+        for index, (old_value, new_value) in enumerate(zip(old, new)):
+            sub_diff = diff_values(old_value, new_value)
+            if sub_diff is not None:
+                changed[str(index)] = sub_diff
+        return ['l', changed]
+
+    return ['=', new]
+
+
+def apply_diff(value, delta):
+    """Apply a delta produced by diff_values and return the new value"""
+    if delta is None:
+        return value
+
+    op = delta[0]
+    if op == '=':
+        return delta[1]
+
+    if op == 'd':
+        result = dict(value)
+        for key, sub_diff in delta[1].items():
+            result[key] = apply_diff(result.get(key), sub_diff)
+        for key in delta[2]:
+            result.pop(key, None)
+        return result
+
+    if op == 'l':
+        result = list(value)
+        for index, sub_diff in delta[1].items():
+            result[int(index)] = apply_diff(result[int(index)], sub_diff)
+        return result
+
+    raise ValueError(f"Unknown delta operation: {op}")
+
+
+class GradeHistoryStore:
+    """Append-only store of every grade snapshot, kept as compressed deltas
+
+    The record index is read from the file on first use, so creating a
+    store does no disk I/O. All reads and writes hold one lock, since the
+    window and the tray can run checks at the same time.
+
+    With max_bytes, the oldest snapshots are moved into numbered archive
+    files (path.1 is the oldest), which every read still covers.
+    """
+
+    def __init__(self, path, checkpoint_interval=32, max_bytes=None):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self.max_bytes = max_bytes
+
+        # In-memory index of (timestamp, kind, offset, length) per record, None until loaded
+        self._index = None
+        self._lock = threading.RLock()
+        self.end_offset = 0
+        self._latest = None
+
+        # Non-empty deltas written since the last full checkpoint
+        self.deltas_since_checkpoint = None
+        self.checkpoint_offset = 0
+
+        # Read-only stores over the archive files, None until listed
+        self._archives = None
+
+    @property
+    def index(self):
+        """(timestamp, kind, offset, length) per record, read from the file on first use"""
+        if self._index is None:
+            self.load_index()
+        return self._index
+
+    def load_index(self):
+        """Read the record index now if it has not been read yet"""
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+
+    def _load_index(self):
+        """Scan record headers, ignoring a partially written trailing record"""
+        index = []
+        self.end_offset = 0
+        self.deltas_since_checkpoint = None
+        self.checkpoint_offset = 0
+        if not os.path.exists(self.path):
+            self._index = index
+            return
+
+        self._finish_compaction()
+        # The file stays within a few MB, reading it whole is faster than a read per header
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        file_size = len(data)
+        offset = 0
+        while offset + RECORD_HEADER.size <= file_size:
+            timestamp, kind, length = RECORD_HEADER.unpack_from(data, offset)
+            payload_offset = offset + RECORD_HEADER.size
+            if payload_offset + length > file_size:
+                break
+            index.append((timestamp, kind, payload_offset, length))
+            self._count_record(kind, length, offset)
+            offset = payload_offset + length
+        self.end_offset = offset
+        self._index = index
+
+    def archive_paths(self):
+        """Return the archive files of this store, oldest first"""
+        directory, base_name = os.path.split(self.path)
+        if not os.path.isdir(directory or "."):
+            return []
+        numbers = []
+        for file_name in os.listdir(directory or "."):
+            suffix = file_name[len(base_name) + 1:]
+            if file_name.startswith(base_name + ".") and suffix.isdigit():
+                numbers.append(int(suffix))
+        return [f"{self.path}.{number}" for number in sorted(numbers)]
+
+    def _segments(self):
+        """Return the archive stores, oldest first, followed by this store"""
+        if self._archives is None:
+            self._archives = [GradeHistoryStore(path) for path in self.archive_paths()]
+        return self._archives + [self]
+
+    def _segment_at(self, when):
+        """Find the store holding the last snapshot taken at or before a given time"""
+        for segment in reversed(self._segments()):
+            if segment.index and segment.index[0][0] <= when.timestamp():
+                return segment
+        return None
+
+    def _finish_compaction(self):
+        """Drop the records already archived if a compaction stopped before rewriting this file"""
+        archive_paths = self.archive_paths()
+        if not archive_paths:
+            return
+        with open(archive_paths[-1], 'rb') as f:
+            archived = f.read()
+        with open(self.path, 'rb') as f:
+            if not archived or f.read(len(archived)) != archived:
+                return
+            remaining = f.read()
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(remaining)
+        os.replace(temp_path, self.path)
+
+    def _count_record(self, kind, length, offset):
+        """Track how many deltas have been chained since the last checkpoint"""
+        if kind == KIND_FULL:
+            self.deltas_since_checkpoint = 0
+            self.checkpoint_offset = offset
+        elif length and self.deltas_since_checkpoint is not None:
+            self.deltas_since_checkpoint += 1
+
+    def _read_payload(self, f, offset, length):
+        """Read and decode one record payload"""
+        if length == 0:
+            return None
+        f.seek(offset)
+        return json.loads(zlib.decompress(f.read(length)).decode('utf-8'))
+
+    def _encode(self, value):
+        """Serialize and compress a payload"""
+        raw = json.dumps(value, separators=(',', ':'), sort_keys=True)
+        return zlib.compress(raw.encode('utf-8'), 9)
+
+    def latest(self):
+        """Return the most recent snapshot, or None if the store is empty"""
+        with self._lock:
+            if self._latest is None and self.index:
+                self._latest = self._reconstruct(len(self.index) - 1)
+            return self._latest
+
+    def append(self, grades, timestamp=None):
+        """Append a snapshot, storing only its delta against the previous one"""
+        with self._lock:
+            timestamp = timestamp or datetime.now()
+            self.load_index()
+            previous = self.latest()
+            since_checkpoint = self.deltas_since_checkpoint
+
+            # With a size limit, keep checkpoints close enough together that compact() can cut there
+            checkpoint_due = bool(self.max_bytes) and self.end_offset - self.checkpoint_offset >= self.max_bytes // 4
+
+            if previous is None or since_checkpoint is None or since_checkpoint >= self.checkpoint_interval or checkpoint_due:
+                kind, payload = KIND_FULL, self._encode(grades)
+            else:
+                delta = diff_values(previous, grades)
+                payload = self._encode(delta) if delta is not None else b''
+                kind = KIND_DELTA
+
+                # A delta bigger than the snapshot itself is better stored as a checkpoint
+                full_payload = self._encode(grades) if len(payload) > 256 else None
+                if full_payload is not None and len(full_payload) <= len(payload):
+                    kind, payload = KIND_FULL, full_payload
+
+            seconds = int(timestamp.timestamp())
+            header = RECORD_HEADER.pack(seconds, kind, len(payload))
+            with open(self.path, 'ab') as f:
+                # Drop any partially written record left behind by a crash
+                f.truncate(self.end_offset)
+                f.seek(self.end_offset)
+                f.write(header + payload)
+
+            self.index.append((seconds, kind, self.end_offset + RECORD_HEADER.size, len(payload)))
+            self._count_record(kind, len(payload), self.end_offset)
+            self.end_offset += RECORD_HEADER.size + len(payload)
+            self._latest = grades
+        
+            if self.max_bytes and self.end_offset > self.max_bytes:
+                self.compact()
+
+    def compact(self):
+        """Move the oldest snapshots into a new archive file so this one shrinks to about half of max_bytes
+
+        Both parts start at a full checkpoint, so each file can be read on its own.
+        """
+        with self._lock:
+            target = self.end_offset - (self.max_bytes or self.end_offset) // 2
+            start = None
+            for _, kind, offset, _ in self.index:
+                header_offset = offset - RECORD_HEADER.size
+                if kind == KIND_FULL and header_offset >= target:
+                    start = header_offset
+                    break
+            if not start:
+                return
+
+            archive_paths = self.archive_paths()
+            number = int(archive_paths[-1].rsplit(".", 1)[1]) + 1 if archive_paths else 1
+            archive_path = f"{self.path}.{number}"
+            temp_path = self.path + ".tmp"
+            with open(self.path, 'rb') as source:
+                with open(temp_path, 'wb') as destination:
+                    destination.write(source.read(start))
+                os.replace(temp_path, archive_path)
+                with open(temp_path, 'wb') as destination:
+                    destination.write(source.read(self.end_offset - start))
+            os.replace(temp_path, self.path)
+            self._archives = None
+
+            latest = self._latest
+            self._load_index()
+            self._latest = latest
+
+    def _reconstruct(self, position):
+        """Rebuild the snapshot at an index position from its nearest checkpoint"""
+        start = position
+        while start > 0 and self.index[start][1] != KIND_FULL:
+            start -= 1
+
+        grades = None
+        with open(self.path, 'rb') as f:
+            for _, kind, offset, length in self.index[start:position + 1]:
+                payload = self._read_payload(f, offset, length)
+                if kind == KIND_FULL:
+                    grades = payload
+                else:
+                    grades = apply_diff(grades, payload)
+        return grades
+
+    def _position_at(self, when):
+        """Find the index of the last record taken at or before a given time"""
+        target = when.timestamp()
+        low, high = 0, len(self.index)
+        while low < high:
+            middle = (low + high) // 2
+            if self.index[middle][0] <= target:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+    def snapshot_at(self, when):
+        """Return the grades as they were at a given datetime, or None"""
+        with self._lock:
+            segment = self._segment_at(when)
+            if segment is None:
+                return None
+            return segment._reconstruct(segment._position_at(when))
+
+    def timestamp_at(self, when):
+        """Return when the snapshot in effect at a given datetime was taken, or None"""
+        with self._lock:
+            segment = self._segment_at(when)
+            if segment is None:
+                return None
+            return datetime.fromtimestamp(segment.index[segment._position_at(when)][0])
+
+    def timestamps(self):
+        """Return the datetime of every stored snapshot, archived ones included"""
+        with self._lock:
+            return [datetime.fromtimestamp(timestamp)
+                    for segment in self._segments() for timestamp, _, _, _ in segment.index]
+
+    def iter_snapshots(self, start=None, end=None):
+        """Yield (datetime, grades) pairs in order, one snapshot in memory at a time
+
+        Archived snapshots come first. The store stays locked until the
+        iteration ends, so consume it promptly.
+        """
+        with self._lock:
+            for segment in self._segments():
+                if not segment.index:
+                    continue
+                if start is not None and segment.index[-1][0] < start.timestamp():
+                    continue
+                if end is not None and segment.index[0][0] > end.timestamp():
+                    break
+                for timestamp, grades in segment._iter_records(start, end):
+                    yield datetime.fromtimestamp(timestamp), grades
+
+    def _iter_records(self, start=None, end=None):
+        """Yield (epoch seconds, grades) for the records of this file only"""
+        index = self.index
+        first = 0
+        if start is not None:
+            first = max(self._position_at(start), 0)
+            if index[first][0] < start.timestamp():
+                first += 1
+
+        end_seconds = end.timestamp() if end is not None else None
+        grades = self._reconstruct(first) if first < len(index) else None
+        with open(self.path, 'rb') as f:
+            for position in range(first, len(index)):
+                timestamp, kind, offset, length = index[position]
+                if end_seconds is not None and timestamp > end_seconds:
+                    break
+                # Empty deltas, most polls, keep the same grades object
+                if position > first and length:
+                    payload = self._read_payload(f, offset, length)
+                    grades = payload if kind == KIND_FULL else apply_diff(grades, payload)
+                yield timestamp, grades
@@ -2,6 +2,7 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QTextEdit, QLabel, QMessageBox,
                              QApplication)
 from PySide6.QtCore import QThread, Signal, Qt
+import time
 from .config_dialog import ConfigDialog
 
 class GradeCheckerThread(QThread):
@@ -15,15 +16,35 @@ class GradeCheckerThread(QThread):
         changes = self.checker.check_grades()
         self.finished.emit(changes)
 
+class TokenLoaderThread(QThread):
+    finished = Signal(bool)  # Emits whether a token was found
+
+    def __init__(self, checker):
+        super().__init__()
+        self.checker = checker
+
+    def run(self):
+        token = self.checker.load_token()
+        # Saved grades are read here too, keeping disk I/O off the startup path
+        self.checker.prime_state()
+        self.finished.emit(bool(token))
+
 class MainWindow(QMainWindow):
-    def __init__(self, checker, parent=None):
+    credentials_loaded = Signal(bool)  # Emitted once the keyring has answered
+
+    def __init__(self, checker, startup_time=None, parent=None):
         super().__init__(parent)
         self.checker = checker
         self.setWindowTitle("Verificador de Notas")
         self.setMinimumSize(600, 400)
         
-        # Initialize checker thread
+        # Startup timing, measured up to the first paint of the window
+        self.startup_time = startup_time
+        self.first_paint_ms = None
+        
+        # Initialize checker and keyring threads
         self.checker_thread = None
+        self.token_thread = None
         
         # Create central widget and layout
         central_widget = QWidget()
@@ -84,11 +105,35 @@ class MainWindow(QMainWindow):
         self.show_initial_display()
 
     def show_initial_display(self):
-        """Show initial grades display"""
-        if not self.checker.is_configured():
+        """Show the cached grades right away, without waiting for the keyring"""
+        self.display_current_grades()
+
+    def paintEvent(self, event):
+        """Record the time to first paint"""
+        super().paintEvent(event)
+        if self.first_paint_ms is None and self.startup_time is not None:
+            self.first_paint_ms = (time.perf_counter() - self.startup_time) * 1000
+            print(f"Time to first paint: {self.first_paint_ms:.0f} ms")
+
+    def load_credentials(self):
+        """Read the stored token from the keyring in the background"""
+        if self.token_thread is not None:
+            return
+        self.token_thread = TokenLoaderThread(self.checker)
+        self.token_thread.finished.connect(self.on_credentials_loaded)
+        self.token_thread.start()
+
+    def on_credentials_loaded(self, has_token):
+        """Handle the keyring answer once startup has finished painting"""
+        self.token_thread.deleteLater()
+        self.token_thread = None
+        
+        if not has_token:
             self.show_config()
-        else:
+        elif not self.accept_button.isVisible():
             self.display_current_grades()
+        
+        self.credentials_loaded.emit(has_token)
 
     def display_current_grades(self):
         """Display current grades"""
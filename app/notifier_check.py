@@ -0,0 +1,220 @@
+import argparse
+import base64
+import json
+import os
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import keyring
+from keyring.backend import KeyringBackend
+from .notifiers import (Notification, NotificationDispatcher, SmtpSink, WebhookSink,
+                        FileDropSink, SMTP_KEYRING_SERVICE)
+
+
+class MemoryKeyring(KeyringBackend):
+    """Keyring kept in memory, so the check never touches the real one"""
+
+    priority = 1
+
+    def __init__(self):
+        super().__init__()
+        self.passwords = {}
+
+    def get_password(self, service, username):
+        return self.passwords.get((service, username))
+
+    def set_password(self, service, username, password):
+        self.passwords[(service, username)] = password
+
+    def delete_password(self, service, username):
+        self.passwords.pop((service, username), None)
+
+
+class FakeSmtpServer:
+    """Minimal local SMTP server that keeps every message it accepts
+
+    Speaks just enough of the protocol for smtplib: EHLO, AUTH PLAIN,
+    MAIL, RCPT, DATA and QUIT.
+    """
+
+    def __init__(self, username="notas", password="secreto"):
+        self.username = username
+        self.password = password
+        self.messages = []
+        self.logins = []
+        self.server = None
+
+    def start(self):
+        """Serve on a free localhost port and return the port"""
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+            def handle(self):
+                self.reply("220 localhost ESMTP")
+                sender, recipients = None, []
+                for raw in self.rfile:
+                    command = raw.decode('utf-8', 'replace').rstrip("\r\n")
+                    verb = command.split(" ", 1)[0].upper()
+                    if verb == "EHLO":
+                        self.reply("250-localhost")
+                        self.reply("250 AUTH PLAIN")
+                    elif verb == "HELO":
+                        self.reply("250 localhost")
+                    elif verb == "AUTH":
+                        _, username, password = base64.b64decode(command.split()[2]).decode('utf-8').split("\0")
+                        fake.logins.append(username)
+                        if (username, password) == (fake.username, fake.password):
+                            self.reply("235 Authentication successful")
+                        else:
+                            self.reply("535 Authentication failed")
+                    elif verb == "MAIL":
+                        sender, recipients = command.split(":", 1)[1].strip(), []
+                        self.reply("250 OK")
+                    elif verb == "RCPT":
+                        recipients.append(command.split(":", 1)[1].strip())
+                        self.reply("250 OK")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        lines = []
+                        for data_line in self.rfile:
+                            if data_line in (b".\r\n", b".\n"):
+                                break
+                            lines.append(data_line)
+                        fake.messages.append({'from': sender, 'to': recipients,
+                                              'data': b"".join(lines).decode('utf-8', 'replace')})
+                        self.reply("250 OK")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-smtp", daemon=True).start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class FakeWebhook:
+    """Local HTTP receiver that keeps the JSON bodies, answering the first requests with an error"""
+
+    def __init__(self, failures=1):
+        self.failures = failures
+        self.requests = 0
+        self.received = []
+        self.server = None
+
+    def start(self):
+        """Serve on a free localhost port and return its URL"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                fake.requests += 1
+                if fake.requests <= fake.failures:
+                    self.send_response(500)
+                else:
+                    fake.received.append(json.loads(body))
+                    self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-webhook", daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def read_drop_dir(directory):
+    """Load the notifications written to a drop directory, ignoring temporary files"""
+    notifications = []
+    for file_name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if file_name.endswith(".json"):
+            with open(os.path.join(directory, file_name), encoding='utf-8') as f:
+                notifications.append(json.load(f))
+    return notifications
+
+
+def run_check(count=3):
+    """Deliver notifications to local SMTP, webhook and file drop stand-ins and return (passed, report lines)"""
+    work_dir = tempfile.mkdtemp(prefix="verificador-notifiers-")
+    smtp = FakeSmtpServer()
+    webhook = FakeWebhook()
+    dispatcher = NotificationDispatcher()
+    previous_keyring = keyring.get_keyring()
+    try:
+        # The SMTP password comes from the keyring, as in the app
+        memory_keyring = MemoryKeyring()
+        memory_keyring.set_password(SMTP_KEYRING_SERVICE, smtp.username, smtp.password)
+        keyring.set_keyring(memory_keyring)
+
+        smtp_port = smtp.start()
+        webhook_url = webhook.start()
+        drop_dir = os.path.join(work_dir, "drop")
+
+        dispatcher.add_sink(SmtpSink("127.0.0.1", smtp_port, "verificador-notas@localhost",
+                                     ["estudiante@localhost"], username=smtp.username,
+                                     timeout=5, retry_delay=0.1))
+        dispatcher.add_sink(WebhookSink(webhook_url, timeout=5, retry_delay=0.1))
+        dispatcher.add_sink(FileDropSink(drop_dir, retry_delay=0.1))
+
+        titles = [f"🎓 Nota {number}" for number in range(1, count + 1)]
+        for title in titles:
+            dispatcher.dispatch(Notification(title, "Tu calificación: 18", {'course': "Curso 1"}))
+        dispatcher.flush()
+        dropped = read_drop_dir(drop_dir)
+    finally:
+        dispatcher.stop(timeout=10)
+        keyring.set_keyring(previous_keyring)
+        smtp.stop()
+        webhook.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    checks = [
+        ("correo", len(smtp.messages) == count and smtp.logins == [smtp.username] * count
+         and all("Subject:" in message['data'] for message in smtp.messages),
+         f"{len(smtp.messages)} mensajes, {len(smtp.logins)} inicios de sesión"),
+        ("webhook", sorted(item['title'] for item in webhook.received) == sorted(titles),
+         f"{len(webhook.received)} recibidos en {webhook.requests} peticiones"),
+        ("carpeta", sorted(item['title'] for item in dropped) == sorted(titles),
+         f"{len(dropped)} archivos"),
+    ]
+    report = [f"{label}: {details} {'OK' if ok else 'FALLÓ'}" for label, ok, details in checks]
+    return all(ok for _, ok, _ in checks), report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.notifier_check",
+        description="Comprueba la entrega de notificaciones contra servidores SMTP y HTTP locales.")
+    parser.add_argument('--count', type=int, default=3, help="notificaciones a enviar (por defecto: 3)")
+    args = parser.parse_args(argv)
+
+    passed, report = run_check(args.count)
+    print("\n".join(report))
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime
+from email.message import EmailMessage
+import keyring
+import requests
+
+# Keyring service holding the SMTP password, under the SMTP username
+SMTP_KEYRING_SERVICE = "verificador-notas-smtp"
+
+
+class Notification:
+    """A grade notification, delivered to every configured sink"""
+
+    def __init__(self, title, message, details=None):
+        self.title = title
+        self.message = message
+        self.details = details or {}
+        self.timestamp = datetime.now()
+
+    def to_dict(self):
+        """Serializable form used by the webhook and file drop sinks"""
+        return {
+            'title': self.title,
+            'message': self.message,
+            'details': self.details,
+            'timestamp': self.timestamp.isoformat()
+        }
+
+
+class NotificationSink:
+    """Base class for notification sinks, each with its own retry and timeout"""
+
+    name = "sink"
+
+    def __init__(self, retries=2, timeout=10, retry_delay=2):
+        self.retries = retries
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+
+    def send(self, notification):
+        """Deliver one notification, raising on failure"""
+        raise NotImplementedError
+
+    def deliver(self, notification):
+        """Send with retries and exponential backoff, return whether it was delivered"""
+        for attempt in range(self.retries + 1):
+            try:
+                self.send(notification)
+                return True
+            except Exception as e:
+                print(f"Error sending notification via {self.name} (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay * (2 ** attempt))
+        return False
+
+
+class DesktopSink(NotificationSink):
+    """Hands the notification to a callable that shows it on the desktop"""
+
+    name = "desktop"
+
+    def __init__(self, show, **kwargs):
+        super().__init__(**kwargs)
+        self.show = show
+
+    def send(self, notification):
+        self.show(notification.title, notification.message)
+
+
+class SmtpSink(NotificationSink):
+    """Sends the notification by email through an SMTP server
+
+    Without an explicit password, the password for the username is read
+    from the keyring on the first delivery, so startup never waits on it.
+    """
+
+    name = "smtp"
+
+    def __init__(self, host, port, sender, recipients, username=None, password=None,
+                 use_tls=False, **kwargs):
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+
+    def send(self, notification):
+        message = EmailMessage()
+        message['Subject'] = notification.title
+        message['From'] = self.sender
+        message['To'] = ", ".join(self.recipients)
+        message.set_content(notification.message)
+
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as server:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                if self.password is None:
+                    self.password = keyring.get_password(SMTP_KEYRING_SERVICE, self.username) or ""
+                server.login(self.username, self.password)
+            server.send_message(message)
+
+
+class WebhookSink(NotificationSink):
+    """POSTs the notification as JSON to a URL"""
+
+    name = "webhook"
+
+    def __init__(self, url, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+
+    def send(self, notification):
+        response = requests.post(self.url, json=notification.to_dict(), timeout=self.timeout)
+        response.raise_for_status()
+
+
+class FileDropSink(NotificationSink):
+    """Writes each notification as a JSON file into a directory"""
+
+    name = "file"
+
+    def __init__(self, directory, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+
+    def send(self, notification):
+        os.makedirs(self.directory, exist_ok=True)
+        file_name = f"{notification.timestamp.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.json"
+        path = os.path.join(self.directory, file_name)
+
+        # Write under a temporary name so watchers never see a partial file
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(notification.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+
+class NotificationDispatcher:
+    """Delivers notifications in the background, one queue and worker per sink
+
+    dispatch() never blocks, so a slow or unreachable sink cannot delay the
+    check cycle or the other sinks.
+    """
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self.sinks = []
+        self._workers = []
+
+    def add_sink(self, sink):
+        """Register a sink and start its delivery worker"""
+        sink_queue = queue.Queue(maxsize=self.max_pending)
+        worker = threading.Thread(target=self._run, args=(sink, sink_queue),
+                                  name=f"notifier-{sink.name}", daemon=True)
+        self.sinks.append(sink)
+        self._workers.append((sink, sink_queue, worker))
+        worker.start()
+
+    def dispatch(self, notification):
+        """Queue a notification for every sink without waiting for delivery"""
+        for sink, sink_queue, _ in self._workers:
+            try:
+                sink_queue.put_nowait(notification)
+            except queue.Full:
+                print(f"Notification queue for {sink.name} is full, dropping notification")
+
+    def _run(self, sink, sink_queue):
+        """Worker loop delivering queued notifications to one sink"""
+        while True:
+            notification = sink_queue.get()
+            try:
+                if notification is None:
+                    return
+                sink.deliver(notification)
+            finally:
+                sink_queue.task_done()
+
+    def flush(self):
+        """Block until every queued notification has been handled"""
+        for _, sink_queue, _ in self._workers:
+            sink_queue.join()
+
+    def stop(self, timeout=None):
+        """Stop all workers after they finish their pending notifications"""
+        for _, sink_queue, _ in self._workers:
+            sink_queue.put(None)
+        for _, _, worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+        self.sinks = []
@@ -0,0 +1,15 @@
+import PySide6
+
+# PySide6 6.12 drops a reference to None or True on almost every call into Qt
+# (signal emits, void methods), so a long-running app aborts with
+# "deallocating None" or "deallocating True or False". 6.11 is not affected.
+UNSUPPORTED_PYSIDE_SERIES = {(6, 12)}
+
+
+def get_unsupported_pyside_message():
+    """Explain why the installed PySide6 cannot run the app, or return None if it can"""
+    if tuple(PySide6.__version_info__[:2]) not in UNSUPPORTED_PYSIDE_SERIES:
+        return None
+    return (f"PySide6 {PySide6.__version__} pierde referencias de Python en cada llamada a Qt "
+            "y termina cerrando el programa tras algunas horas.\n"
+            "Instala una versión compatible con: pip install \"PySide6<6.12\"")
@@ -0,0 +1,255 @@
+import json
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+class GradeState:
+    """In-memory copy of the latest grades, recent changes and check status
+
+    Updated by the checker after every check and read by the query server,
+    so clients never trigger Moodle calls or touch the files on disk.
+    """
+
+    def __init__(self, max_changes=200):
+        self.condition = threading.Condition()
+        self.grades = {}
+        self.grades_timestamp = None
+        self.changes = deque(maxlen=max_changes)
+        self.sequence = 0
+
+        # Change ids restart at every launch, the boot id lets clients notice the reset
+        self.boot_id = uuid.uuid4().hex
+        self.last_check = None
+        self.last_error = None
+        self.checking = False
+
+    def load_cached(self, saved_grades):
+        """Prime the state from the grades saved by a previous run, unless a check already filled it"""
+        if not saved_grades or 'grades' not in saved_grades:
+            return
+        with self.condition:
+            if self.grades_timestamp is not None:
+                return
+            self.grades = saved_grades['grades']
+            self.grades_timestamp = saved_grades.get('timestamp')
+
+    def start_check(self):
+        """Mark a check as in progress"""
+        with self.condition:
+            self.checking = True
+
+    def update(self, grades, changes):
+        """Store the result of a successful check and wake up waiting clients"""
+        now = datetime.now().isoformat()
+        with self.condition:
+            self.grades = grades
+            self.grades_timestamp = now
+            for message in changes:
+                self.sequence += 1
+                self.changes.append({'id': self.sequence, 'timestamp': now, 'message': message})
+            self.last_check = now
+            self.last_error = None
+            self.checking = False
+            self.condition.notify_all()
+
+    def record_error(self, message):
+        """Store a failed check"""
+        with self.condition:
+            self.last_check = datetime.now().isoformat()
+            self.last_error = message
+            self.checking = False
+            self.condition.notify_all()
+
+    def get_status(self):
+        """Return the status of the last check"""
+        with self.condition:
+            return {
+                'last_check': self.last_check,
+                'ok': self.last_check is not None and self.last_error is None,
+                'error': self.last_error,
+                'checking': self.checking,
+                'grades_timestamp': self.grades_timestamp,
+                'last_change_id': self.sequence,
+                'boot_id': self.boot_id
+            }
+
+    def get_snapshot(self):
+        """Return the latest grades and when they were fetched"""
+        with self.condition:
+            return {'timestamp': self.grades_timestamp, 'grades': self.grades}
+
+    def get_course(self, key):
+        """Return one course by id or by name, or None"""
+        with self.condition:
+            for course_name, course_data in self.grades.items():
+                if key == course_name or key == str(course_data.get('course_id')):
+                    return {'course': course_name, 'timestamp': self.grades_timestamp, **course_data}
+        return None
+
+    def get_changes(self, since=0):
+        """Return the recent changes newer than a change id"""
+        with self.condition:
+            return [change for change in self.changes if change['id'] > since]
+
+    def wait_for_changes(self, since=0, timeout=30, stop_event=None):
+        """Block until there are changes newer than a change id, the timeout expires or stop_event is set"""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.sequence > since or (stop_event is not None and stop_event.is_set()),
+                timeout)
+            return [change for change in self.changes if change['id'] > since]
+
+    def wake_waiters(self):
+        """Wake every client blocked in wait_for_changes"""
+        with self.condition:
+            self.condition.notify_all()
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """Read-only JSON endpoints over the in-memory grade state"""
+
+    state = None
+    stopping = None
+    analytics = None
+    allowed_hosts = ()
+    max_wait = 60
+
+    def do_GET(self):
+        # Only answer requests addressed to this machine, so a web page cannot
+        # read the grades through DNS rebinding
+        if (self.headers.get('Host') or '').lower() not in self.allowed_hosts:
+            self.send_json({'error': "Host no permitido"}, 403)
+            return
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+
+        try:
+            since = int(query.get('since', ['0'])[0])
+            wait = min(float(query.get('wait', ['0'])[0]), self.max_wait)
+        except ValueError:
+            self.send_json({'error': "Parámetros inválidos"}, 400)
+            return
+
+        # A change id from a previous launch means nothing now, start over
+        boot_id = query.get('boot_id', [None])[0]
+        if boot_id and boot_id != self.state.boot_id:
+            since = 0
+
+        if parts == ['status']:
+            self.send_json(self.state.get_status())
+        elif parts == ['grades']:
+            self.send_json(self.state.get_snapshot())
+        elif len(parts) == 2 and parts[0] == 'grades':
+            course = self.state.get_course(parts[1])
+            if course is None:
+                self.send_json({'error': "Curso no encontrado"}, 404)
+            else:
+                self.send_json(course)
+        elif parts == ['changes']:
+            if wait > 0:
+                changes = self.state.wait_for_changes(since, wait, self.stopping)
+            else:
+                changes = self.state.get_changes(since)
+            self.send_json({'changes': changes, 'last_change_id': self.state.sequence,
+                            'boot_id': self.state.boot_id})
+        elif parts == ['events']:
+            self.stream_events(self.parse_last_event_id(since))
+        elif parts == ['analytics'] and self.analytics is not None:
+            try:
+                self.send_json({'courses': self.analytics()})
+            except Exception as e:
+                print(f"Error computing analytics: {e}")
+                self.send_json({'error': "No se pudo calcular el análisis"}, 500)
+        else:
+            self.send_json({'error': "Ruta no encontrada"}, 404)
+
+    def parse_last_event_id(self, default):
+        """Read the change id to resume from, ignoring ids from a previous launch"""
+        last_id = self.headers.get('Last-Event-ID')
+        if not last_id:
+            return default
+        boot_id, _, change_id = last_id.rpartition(':')
+        if boot_id != self.state.boot_id or not change_id.isdigit():
+            return 0
+        return int(change_id)
+
+    def send_json(self, data, status=200):
+        """Send a JSON response"""
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self, since):
+        """Push changes to the client as Server-Sent Events until it disconnects"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        try:
+            while not self.stopping.is_set():
+                changes = self.state.wait_for_changes(since, timeout=15, stop_event=self.stopping)
+                if self.stopping.is_set():
+                    break
+                if not changes:
+                    # Keep-alive comment so idle connections are not dropped
+                    self.wfile.write(b": keepalive\n\n")
+                for change in changes:
+                    data = json.dumps({**change, 'boot_id': self.state.boot_id}, ensure_ascii=False)
+                    event_id = f"{self.state.boot_id}:{change['id']}"
+                    self.wfile.write(f"id: {event_id}\nevent: change\ndata: {data}\n\n".encode('utf-8'))
+                    since = change['id']
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            pass
+
+    def log_message(self, format, *args):
+        # Keep the console quiet, the app runs in the background
+        pass
+
+
+class QueryServer:
+    """Local HTTP server exposing the grade state to other tools on this machine"""
+
+    def __init__(self, state, host='127.0.0.1', port=8765, analytics=None):
+        self.state = state
+        self.analytics = analytics
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        """Start serving in a background thread"""
+        self.stopping = threading.Event()
+        handler = type('BoundQueryRequestHandler', (QueryRequestHandler,),
+                       {'state': self.state, 'stopping': self.stopping,
+                        'analytics': staticmethod(self.analytics) if self.analytics else None})
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        handler.allowed_hosts = (f"127.0.0.1:{self.port}", f"localhost:{self.port}")
+        self.thread = threading.Thread(target=self.server.serve_forever, name="query-server", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the server, end open event streams and long-polls, and wait for its thread"""
+        if self.server:
+            # Streams run on their own threads, tell them to finish before closing the listener
+            self.stopping.set()
+            self.state.wake_waiters()
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+            self.thread = None
@@ -0,0 +1,348 @@
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from PySide6.QtCore import QCoreApplication, QObject, QSettings, QTimer
+from .grade_checker import MoodleGradeChecker
+from .notifiers import NotificationSink
+from .qt_version import get_unsupported_pyside_message
+from .tray_icon import AutoCheckThread
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class FakeMoodle:
+    """Local stand-in for the Moodle web services used by the checker
+
+    Every request has a chance of publishing or changing one grade, so the
+    checker keeps logging history, saving snapshots and sending notifications.
+    """
+
+    def __init__(self, courses=6, items=10, change_rate=0.2, seed=0):
+        self.random = random.Random(seed)
+        self.change_rate = change_rate
+        self.clock = 1700000000
+        self.lock = threading.Lock()
+        self.courses = [{'id': course_id, 'fullname': f"Curso {course_id}", 'shortname': f"C{course_id}"}
+                        for course_id in range(1, courses + 1)]
+        self.items = {course['id']: [{'id': course['id'] * 100 + item_id, 'itemname': f"Tarea {item_id}",
+                                      'graderaw': None, 'grademax': 5.0, 'grademin': 0.0,
+                                      'gradedategraded': None}
+                                     for item_id in range(items)]
+                      for course in self.courses}
+        self.server = None
+
+    def start(self):
+        """Serve on a free localhost port and return its base URL"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                data = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+                if self.path.endswith('/login/token.php'):
+                    result = {'token': 'soak-token'}
+                else:
+                    result = fake.handle(data.get('wsfunction'), data)
+                body = json.dumps(result).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-moodle", daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def maybe_change_grade(self):
+        """Publish or change one random grade"""
+        if self.random.random() >= self.change_rate:
+            return
+        self.clock += 60
+        item = self.random.choice(self.items[self.random.choice(self.courses)['id']])
+        item['graderaw'] = float(self.random.randint(0, 5))
+        item['gradedategraded'] = self.clock
+
+    def handle(self, function, data):
+        with self.lock:
+            if function == 'tool_mobile_call_external_functions':
+                responses = []
+                index = 0
+                while f'requests[{index}][function]' in data:
+                    arguments = json.loads(data.get(f'requests[{index}][arguments]', '{}'))
+                    result = self.call(data[f'requests[{index}][function]'], arguments)
+                    responses.append({'error': False, 'data': json.dumps(result)})
+                    index += 1
+                return {'responses': responses}
+            return self.call(function, data)
+
+    def call(self, function, arguments):
+        if function == 'core_webservice_get_site_info':
+            self.maybe_change_grade()
+            return {'userid': 42, 'username': 'soak'}
+        if function == 'core_enrol_get_users_courses':
+            return self.courses
+        if function == 'gradereport_user_get_grade_items':
+            items = self.items.get(int(arguments.get('courseid', 0)), [])
+            return {'usergrades': [{'gradeitems': [dict(item) for item in items]}]}
+        return {'exception': 'invalid_parameter_exception', 'errorcode': 'invalidparameter',
+                'message': f"Unknown function {function}"}
+
+
+class CountingSink(NotificationSink):
+    """Notification sink that only counts deliveries"""
+
+    name = "counter"
+
+    def __init__(self):
+        super().__init__(retries=0)
+        self.delivered = 0
+
+    def send(self, notification):
+        self.delivered += 1
+
+
+def get_rss_bytes():
+    """Resident memory of this process, or None if it cannot be measured"""
+    if psutil:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def get_open_handles():
+    """Open file descriptors (or Windows handles) of this process, or None"""
+    if psutil:
+        process = psutil.Process()
+        return process.num_handles() if hasattr(process, 'num_handles') else process.num_fds()
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def get_directory_size(path):
+    """Total size of the files in a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def find_growth(samples, key, fraction=0.25):
+    """Median of the last part of the run minus the median of the first part"""
+    values = [sample[key] for sample in samples if sample[key] is not None]
+    window = max(1, int(len(values) * fraction))
+    if len(values) < 2 * window:
+        return None, None
+    first = statistics.median(values[:window])
+    last = statistics.median(values[-window:])
+    return first, last
+
+
+def get_thread_count():
+    """Operating system threads of this process, including Qt threads"""
+    if psutil:
+        return psutil.Process().num_threads()
+    try:
+        return len(os.listdir('/proc/self/task'))
+    except OSError:
+        return threading.active_count()
+
+
+class SoakDriver(QObject):
+    """Runs one AutoCheckThread per cycle and samples resource usage between cycles"""
+
+    def __init__(self, checker, cycles, warmup, sample_every, status_url, data_dir):
+        super().__init__()
+        self.checker = checker
+        self.cycles = cycles
+        self.warmup = warmup
+        self.sample_every = sample_every
+        self.status_url = status_url
+        self.data_dir = data_dir
+        self.cycle = 0
+        self.started = None
+        self.checker_thread = None
+        self.samples = []
+        self.latencies = []
+        self.errors = 0
+        self.error = None
+
+    def start_cycle(self):
+        """Start the next check on a new thread, like the tray's auto check"""
+        self.cycle += 1
+        self.started = time.perf_counter()
+        self.checker_thread = AutoCheckThread(self.checker)
+        self.checker_thread.finished.connect(self.on_cycle_completed)
+        self.checker_thread.start()
+
+    def on_cycle_completed(self, changes):
+        """Record the cycle and clean up its thread the same way the tray does"""
+        self.latencies.append(time.perf_counter() - self.started)
+        self.checker_thread.wait()
+        self.checker_thread.deleteLater()
+        self.checker_thread = None
+
+        try:
+            if changes and changes[0].startswith("❌"):
+                self.errors += 1
+            with urllib.request.urlopen(self.status_url) as response:
+                response.read()
+            if self.cycle > self.warmup and self.cycle % self.sample_every == 0:
+                self.take_sample()
+        except Exception as e:
+            self.error = e
+            QCoreApplication.quit()
+            return
+
+        if self.cycle < self.cycles:
+            # Go back to the event loop first so the finished thread is actually deleted
+            QTimer.singleShot(0, self.start_cycle)
+        else:
+            QCoreApplication.quit()
+
+    def take_sample(self):
+        """Measure memory, handles, threads, latency and disk use"""
+        archived = sum(os.path.getsize(path) for path in self.checker.snapshot_store.archive_paths())
+        gc.collect()
+        recent = self.latencies[-self.sample_every:]
+        sample = {
+            'cycle': self.cycle,
+            'rss': get_rss_bytes(),
+            'handles': get_open_handles(),
+            'threads': get_thread_count(),
+            'latency': statistics.median(recent),
+            # Archived snapshots are kept on purpose, only the live files must stay bounded
+            'disk': get_directory_size(self.data_dir) - archived,
+            'archived': archived,
+        }
+        self.samples.append(sample)
+        rss = f"{sample['rss'] / 1024 / 1024:.1f} MB" if sample['rss'] else "n/a"
+        print(f"ciclo {self.cycle}: RSS {rss}, handles {sample['handles']}, hilos {sample['threads']}, "
+              f"latencia {sample['latency'] * 1000:.1f} ms, disco {sample['disk'] / 1024:.0f} KB, "
+              f"archivado {sample['archived'] / 1024:.0f} KB")
+
+
+def run_soak(cycles=2000, warmup=100, sample_every=50, rss_tolerance_mb=20, handle_tolerance=10,
+             thread_tolerance=3, latency_ratio=2.0, seed=0):
+    """Run accelerated check cycles and return (passed, report lines)"""
+    # The app refuses to start on these bindings, a soak run would only reproduce the crash
+    unsupported = get_unsupported_pyside_message()
+    if unsupported:
+        return False, [unsupported]
+
+    work_dir = tempfile.mkdtemp(prefix="verificador-soak-")
+    fake = FakeMoodle(seed=seed)
+    checker = None
+    try:
+        base_url = fake.start()
+
+        # Small limits so rotation and compaction happen many times during the run
+        settings = QSettings(os.path.join(work_dir, "settings.ini"), QSettings.Format.IniFormat)
+        settings.setValue("history/max_bytes", 64 * 1024)
+        settings.setValue("history/backups", 2)
+        settings.setValue("history/max_snapshot_bytes", 32 * 1024)
+        settings.setValue("api/port", 0)
+        disk_limit = 64 * 1024 * 3 + 32 * 1024 + 512 * 1024
+
+        data_dir = os.path.join(work_dir, "data")
+        checker = MoodleGradeChecker(data_dir=data_dir, settings=settings, base_url=base_url)
+        checker.token = "soak-token"
+        checker.token_loaded = True
+        counter = CountingSink()
+        checker.notifier.add_sink(counter)
+        checker.start_query_server()
+        status_url = f"http://127.0.0.1:{checker.query_server.port}/status"
+
+        # Cycles run on AutoCheckThread under a Qt event loop, the same way the tray runs them
+        driver = SoakDriver(checker, cycles, warmup, sample_every, status_url, data_dir)
+        app = QCoreApplication.instance() or QCoreApplication([])
+        QTimer.singleShot(0, driver.start_cycle)
+        app.exec()
+    finally:
+        if checker is not None:
+            checker.stop_query_server()
+            checker.notifier.flush()
+            checker.notifier.stop()
+        fake.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if driver.error:
+        raise driver.error
+    samples = driver.samples
+    errors = driver.errors
+
+    report = [f"{cycles} ciclos, {errors} errores, {counter.delivered} notificaciones"]
+    passed = errors == 0
+
+    checks = [
+        ('rss', lambda first, last: last - first <= rss_tolerance_mb * 1024 * 1024, "RSS"),
+        ('handles', lambda first, last: last - first <= handle_tolerance, "handles abiertos"),
+        ('threads', lambda first, last: last - first <= thread_tolerance, "hilos"),
+        ('latency', lambda first, last: last <= first * latency_ratio, "latencia por ciclo"),
+        ('disk', lambda first, last: last <= disk_limit, "uso de disco sin archivos"),
+    ]
+    for key, within_limit, label in checks:
+        first, last = find_growth(samples, key)
+        if first is None:
+            report.append(f"{label}: sin datos suficientes")
+            continue
+        ok = within_limit(first, last)
+        passed = passed and ok
+        report.append(f"{label}: {first:.4g} → {last:.4g} {'OK' if ok else 'CRECE SIN LÍMITE'}")
+    if samples:
+        report.append(f"historial archivado: {samples[-1]['archived'] / 1024:.0f} KB, se conserva completo")
+
+    return passed, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.soak",
+        description="Prueba de larga duración contra un Moodle local simulado.")
+    parser.add_argument('--cycles', type=int, default=2000, help="ciclos de verificación (por defecto: 2000)")
+    parser.add_argument('--warmup', type=int, default=100, help="ciclos ignorados al inicio")
+    parser.add_argument('--sample-every', type=int, default=50, help="ciclos entre mediciones")
+    parser.add_argument('--rss-tolerance-mb', type=float, default=20, help="crecimiento de RSS permitido")
+    parser.add_argument('--seed', type=int, default=0, help="semilla de los cambios simulados")
+    args = parser.parse_args(argv)
+
+    passed, report = run_soak(args.cycles, args.warmup, args.sample_every,
+                              rss_tolerance_mb=args.rss_tolerance_mb, seed=args.seed)
+    print("\n".join(report))
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,11 @@
-from PySide6.QtWidgets import QSystemTrayIcon, QMenu, QApplication
+from PySide6.QtWidgets import QSystemTrayIcon, QMenu, QApplication, QMessageBox
 from PySide6.QtGui import QIcon
 from PySide6.QtCore import QTimer, QThread, Signal
 import os
+import platform
+if platform.system() == "Windows":
+    import winsound
+from .notifiers import DesktopSink
 
 class AutoCheckThread(QThread):
     finished = Signal(list)
@@ -15,12 +19,18 @@ class AutoCheckThread(QThread):
         self.finished.emit(changes)
 
 class SystemTrayIcon(QSystemTrayIcon):
+    notification_requested = Signal(str, str)  # Title and message from the notifier thread
+
     def __init__(self, checker, main_window, parent=None):
         super().__init__(parent)
         self.checker = checker
         self.main_window = main_window
         self.setToolTip("Verificador de Notas")
         
+        # Desktop notifications are shown on the GUI thread through a queued signal
+        self.notification_requested.connect(self.show_notification)
+        self.checker.notifier.add_sink(DesktopSink(self.notification_requested.emit))
+        
         # Set the tray icon
         icon_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'icon.ico')
         if os.path.exists(icon_path):
@@ -54,6 +64,14 @@ class SystemTrayIcon(QSystemTrayIcon):
         # Set up automation timer if enabled
         if self.checker.is_automation_enabled():
             self.setup_automation()
+        
+        # Run the first check as soon as the keyring has answered
+        self.main_window.credentials_loaded.connect(self.on_credentials_loaded)
+
+    def on_credentials_loaded(self, has_token):
+        """Start the first automated check once credentials are available"""
+        if has_token and self.checker.is_automation_enabled():
+            self.automated_check()
 
     def tray_icon_activated(self, reason):
         """Handle tray icon activation"""
@@ -97,6 +115,13 @@ class SystemTrayIcon(QSystemTrayIcon):
         self.checker_thread.deleteLater()
         self.checker_thread = None
     
+    def show_notification(self, title, message):
+        """Show a grade notification dialog"""
+        if platform.system() == "Windows":
+            # Play Windows notification sound
+            winsound.MessageBeep(winsound.MB_OK)
+        QMessageBox.information(None, title, message)
+    
     def show_window(self):
         """Show the main window"""
         self.main_window.show()
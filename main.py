@@ -1,3 +1,6 @@
+import time
+STARTUP_TIME = time.perf_counter()  # Taken before the Qt imports to measure time to first paint
+
 import sys
 from PySide6.QtWidgets import QApplication, QMessageBox, QSystemTrayIcon
 from PySide6.QtGui import QIcon
@@ -5,11 +8,19 @@ import os
 from app.main_window import MainWindow
 from app.grade_checker import MoodleGradeChecker
 from app.tray_icon import SystemTrayIcon
+from app.qt_version import get_unsupported_pyside_message
 
 def main():
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)  # Don't quit when window is closed
     
+    # Refuse to run on Qt bindings known to crash after enough checks
+    unsupported = get_unsupported_pyside_message()
+    if unsupported:
+        print(unsupported, file=sys.stderr)
+        QMessageBox.critical(None, "Verificador de Notas", unsupported)
+        return 1
+    
     # Set application icon
     icon_path = os.path.join(os.path.dirname(__file__), 'icon.ico')
     if os.path.exists(icon_path):
@@ -18,8 +29,8 @@ def main():
     # Create the grade checker instance
     checker = MoodleGradeChecker()
     
-    # Create main window
-    window = MainWindow(checker)
+    # Create main window, rendered from the cached grades
+    window = MainWindow(checker, startup_time=STARTUP_TIME)
     
     # Create system tray icon
     tray = SystemTrayIcon(checker, window)
@@ -37,6 +48,14 @@ def main():
     # Show main window
     window.show()
     
+    # Keyring access and the first check happen after the window is up
+    window.load_credentials()
+    
+    # Serve the in-memory grades to local tools if enabled
+    if checker.is_query_api_enabled():
+        checker.start_query_server()
+    app.aboutToQuit.connect(checker.stop_query_server)
+    
     return app.exec()
 
 if __name__ == '__main__':